@@ -17,8 +17,9 @@ def main():
     
     print(f"Status: {result.status}")
     if result.status == "ok":
-        print(f"Title: {result.title}")
-        print(f"Price: {result.price}")
+        # Selected fields missing from the output are omitted
+        print(f"Title: {result.output.get('title')}")
+        print(f"Price: {result.output.get('price')}")
         print(f"Raw data: {result.raw}")
     else:
         print(f"Error: {result.output.get('message', 'Unknown error')}")
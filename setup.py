@@ -21,6 +21,7 @@ setup(
         "cryptography>=41.0.0",
         "jinja2>=3.1.0",
         "python-multipart>=0.0.6",
+        "groq>=0.18.0",
     ],
     extras_require={
         "dev": [
@@ -31,6 +32,9 @@ setup(
             "mypy>=1.7.0",
             "ruff>=0.1.0",
         ],
+        "speedups": [
+            "orjson>=3.9.0",
+        ],
     },
     entry_points={
         "console_scripts": [
@@ -3,6 +3,13 @@
 __version__ = "0.1.0"
 __author__ = "Capibara Team"
 
-from .sdk import Capibara
-
 __all__ = ["Capibara"]
+
+
+def __getattr__(name):
+    # Import the SDK lazily so that `import capibara` (and the CLI entry
+    # point) does not pull in pydantic and the Groq client up front.
+    if name == "Capibara":
+        from .sdk import Capibara
+        return Capibara
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
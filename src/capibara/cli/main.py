@@ -7,16 +7,17 @@ from typing import Any, Dict, Optional
 
 import click
 from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.syntax import Syntax
-
-from ..sdk.client import Capibara
 
 
 console = Console()
 
 
+def _get_client(work_dir: Path):
+    """Create the SDK client, importing it only when a command needs it."""
+    from ..sdk.client import Capibara
+    return Capibara(work_dir=work_dir)
+
+
 @click.group()
 @click.option("--work-dir", "-w", type=click.Path(exists=True, file_okay=False), help="Working directory")
 @click.option("--verbose", "-v", is_flag=True, help="Verbose output")
@@ -59,7 +60,7 @@ def run(ctx, prompt: str, context: Optional[str], select: tuple, refresh: bool,
                 sys.exit(1)
     
     # Initialize Capibara
-    capibara = Capibara(work_dir=work_dir)
+    capibara = _get_client(work_dir)
     
     if verbose:
         console.print(f"[blue]Running prompt:[/blue] {prompt}")
@@ -99,9 +100,11 @@ def run(ctx, prompt: str, context: Optional[str], select: tuple, refresh: bool,
 @click.pass_context
 def list(ctx):
     """List cached scripts."""
+    from rich.table import Table
+    
     work_dir = ctx.obj["work_dir"]
     
-    capibara = Capibara(work_dir=work_dir)
+    capibara = _get_client(work_dir)
     scripts = capibara.list_scripts()
     
     if not scripts:
@@ -135,9 +138,12 @@ def list(ctx):
 @click.pass_context
 def show(ctx, fingerprint: str):
     """Show details of a cached script."""
+    from rich.panel import Panel
+    from rich.syntax import Syntax
+    
     work_dir = ctx.obj["work_dir"]
     
-    capibara = Capibara(work_dir=work_dir)
+    capibara = _get_client(work_dir)
     script_dir = capibara.cache_dir / fingerprint
     
     if not script_dir.exists():
@@ -174,7 +180,7 @@ def clear(ctx):
     """Clear all cached scripts."""
     work_dir = ctx.obj["work_dir"]
     
-    capibara = Capibara(work_dir=work_dir)
+    capibara = _get_client(work_dir)
     capibara.clear_cache()
     
     console.print("[green]✓ Cache cleared[/green]")
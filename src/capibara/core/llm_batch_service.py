@@ -0,0 +1,152 @@
+"""Batch LLM service using the Groq Batch API."""
+
+import asyncio
+import json
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+
+from .llm_service import GroqLLMService
+
+
+# Groq limits a batch input file to 50,000 requests and 200 MB
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class GroqBatchLLMService(GroqLLMService):
+    """LLM service that queues generations and submits them as Groq batch jobs.
+
+    Batch jobs are cheaper and not subject to the per-request rate limits,
+    but complete asynchronously (up to the completion window), so this is
+    meant for bulk, latency-insensitive generation. The synchronous
+    ``generate_script`` still calls the chat completions endpoint directly.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        flush_interval_s: float = 5.0,
+        poll_interval_s: float = 30.0,
+        max_requests: int = MAX_BATCH_REQUESTS,
+        completion_window: str = "24h"
+    ):
+        """Initialize the Groq batch LLM service."""
+        super().__init__(api_key)
+        self.flush_interval_s = flush_interval_s
+        self.poll_interval_s = poll_interval_s
+        self.max_requests = min(max_requests, MAX_BATCH_REQUESTS)
+        self.completion_window = completion_window
+
+        self._queue: List[bytes] = []
+        self._queue_bytes = 0
+        self._pending: Dict[str, Tuple[asyncio.Future, str, Dict[str, Any]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_tasks: set = set()
+
+    def submit(self, prompt: str, context: Dict[str, Any] = None) -> asyncio.Future:
+        """Queue a generation request and return a future for its result."""
+        context = context or {}
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        custom_id = uuid.uuid4().hex
+        line = json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self._completion_args(prompt, context)
+        }).encode() + b"\n"
+
+        if self._queue_bytes + len(line) > MAX_BATCH_BYTES:
+            self._flush()
+
+        self._queue.append(line)
+        self._queue_bytes += len(line)
+        self._pending[custom_id] = (future, prompt, context)
+
+        if len(self._queue) >= self.max_requests:
+            self._flush()
+        elif self._flush_task is None:
+            self._flush_task = loop.create_task(self._flush_later())
+
+        return future
+
+    async def agenerate_script(self, prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Generate a script through the next batch job."""
+        return await self.submit(prompt, context)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval_s)
+        self._flush_task = None
+        self._flush()
+
+    def _flush(self) -> None:
+        """Submit all queued requests as one batch job."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if not self._queue:
+            return
+
+        lines, self._queue, self._queue_bytes = self._queue, [], 0
+        task = asyncio.get_running_loop().create_task(self._run_batch(lines))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, lines: List[bytes]) -> None:
+        """Upload, run and collect a single batch job."""
+        custom_ids = [json.loads(line)["custom_id"] for line in lines]
+        try:
+            input_file = await self.aclient.files.create(
+                file=("capibara_batch.jsonl", b"".join(lines)),
+                purpose="batch"
+            )
+            batch = await self.aclient.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window=self.completion_window
+            )
+            while batch.status not in _TERMINAL_STATUSES:
+                await asyncio.sleep(self.poll_interval_s)
+                batch = await self.aclient.batches.retrieve(batch.id)
+
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    content = await self.aclient.files.content(file_id)
+                    self._resolve(await content.text())
+
+            self._fail(custom_ids, Exception(f"Batch {batch.id} finished with status '{batch.status}' without a result"))
+        except Exception as e:
+            self._fail(custom_ids, Exception(f"Failed to run Groq batch: {str(e)}"))
+
+    def _resolve(self, output: str) -> None:
+        """Set futures from the lines of a batch output or error file."""
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            pending = self._pending.pop(item.get("custom_id"), None)
+            if pending is None:
+                continue
+            future, prompt, context = pending
+            if future.done():
+                continue
+
+            try:
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    error = item.get("error") or response.get("body", {}).get("error")
+                    raise ValueError(f"Batch request failed: {error}")
+                content = response["body"]["choices"][0]["message"]["content"]
+                future.set_result(self._build_result(content, prompt, context))
+            except Exception as e:
+                future.set_exception(Exception(f"Failed to generate script with Groq: {str(e)}"))
+
+    def _fail(self, custom_ids: List[str], error: Exception) -> None:
+        """Fail any futures from a batch that did not get a result."""
+        for custom_id in custom_ids:
+            pending = self._pending.pop(custom_id, None)
+            if pending and not pending[0].done():
+                pending[0].set_exception(error)
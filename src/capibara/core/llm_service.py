@@ -1,29 +1,67 @@
 """LLM service implementation using Groq."""
 
+import ast
+import asyncio
+import functools
+import json
 import os
 import re
-from typing import Dict, Any, Optional
-from groq import Groq
+from typing import Dict, Any, List, Optional, Tuple
 
+import httpx
+from groq import AsyncGroq, DefaultAsyncHttpxClient, DefaultHttpxClient, Groq
 
-class GroqLLMService:
-    """LLM service using Groq for code generation."""
-    
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the Groq LLM service."""
-        self.api_key = api_key or os.environ.get("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY environment variable is required")
-        
-        self.client = Groq(api_key=self.api_key)
-        self.model = "llama-3.3-70b-versatile"
-    
-    def generate_script(self, prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Generate a script using Groq LLM."""
-        context = context or {}
-        
-        # Create a detailed prompt for code generation
-        system_prompt = """You are an expert Python developer. Generate executable Python scripts that follow the Capibara framework.
+
+# Connection pool shared by all requests made through one service instance
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+
+# Fixed delimiters are located with str.find; only the fenced code block
+# needs a regex
+_START_MARKER = "# --- CAPIBARA_START ---"
+_END_MARKER = "# --- CAPIBARA_END ---"
+_HEADER_OPEN = "# --- CAPIBARA ---"
+_HEADER_CLOSE = "# --- /CAPIBARA ---"
+
+# End of a header-only script: the __main__ guard and its whole indented
+# body, which is only known to be over once a non-indented line follows
+_MAIN_GUARD_RE = re.compile(r"""if __name__ == ["']__main__["']:[ \t]*\n(?:[ \t]*\n)*[ \t]+\S[^\n]*\n(?:[ \t]*\n|[ \t]+[^\n]*\n)*""")
+_DEDENT_RE = re.compile(r"\n(?=\S)")
+_CODEBLOCK_RE = re.compile(r"```python\s*(.*?)\s*```", re.DOTALL)
+# A stop sequence can cut the closing fence off a response
+_OPEN_CODEBLOCK_RE = re.compile(r"```python\s*(.*)", re.DOTALL)
+_KV_RE = re.compile(r"^#\s*([A-Za-z_]+)\s*:\s*(.*)$")
+
+# Free-form responses stop at the end of the code block or at the end
+# delimiter, neither of which a script line contains by accident
+DEFAULT_STOP = ["```\n\n", _END_MARKER]
+
+# Completion caps; JSON mode escapes the whole script into a string value,
+# so it needs more room than a free-form response
+DEFAULT_MAX_TOKENS = 1200
+JSON_MAX_TOKENS = 4096
+
+# Imported module -> pinned requirement added to generated headers
+_DEPS_MAP = {
+    "requests": "requests==2.31.0",
+    "pandas": "pandas==2.0.0",
+    "numpy": "numpy==1.24.0",
+    "PIL": "pillow==10.0.0",
+    "pillow": "pillow==10.0.0",
+    "matplotlib": "matplotlib==3.7.0",
+    "cv2": "opencv-python==4.8.0",
+    "opencv": "opencv-python==4.8.0",
+}
+# Result keys of the script contract and their declared types
+_OUTPUT_TYPES = {"artifacts": "list[str]", "output": "dict", "raw": "dict"}
+
+_DEP_RE = re.compile(r"\b(?:import|from)\s+(requests|pandas|numpy|PIL|pillow|matplotlib|cv2|opencv)\b")
+_NET_RE = re.compile(r"http|api|url|request|fetch|download", re.IGNORECASE)
+
+
+# Static system prompts, kept byte-identical across calls and sent as the
+# first message so provider-side prompt caching can reuse the prefix
+_SYSTEM_PROMPT = """You are an expert Python developer. Generate executable Python scripts that follow the Capibara framework.
 
 IMPORTANT: The script must start with the exact Capibara header format and include the complete Python code.
 
@@ -69,6 +107,203 @@ if __name__ == "__main__":
 
 Generate ONLY the complete script with the exact header format shown above. Do not include any explanations or markdown formatting."""
 
+_JSON_SYSTEM_PROMPT = _SYSTEM_PROMPT + """
+
+Respond with a single JSON object instead of the raw script, using these fields:
+- "script": the complete Python code as a string (the Capibara header may be omitted)
+- "deps": list of pinned pip requirements, e.g. ["requests==2.31.0"]
+- "network": true if the script needs internet access, otherwise false
+- "deterministic": true only if the output depends solely on the context (no network, clock, randomness or outside files)"""
+
+
+class AsyncRateLimiter:
+    """Leaky-bucket limiter allowing ``max_rate`` units per ``time_period`` seconds.
+    
+    Waiters are served in order. A single request larger than the whole
+    budget is let through once the bucket has drained, rather than
+    blocking forever.
+    """
+    
+    def __init__(self, max_rate: float, time_period: float = 60.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._level = 0.0
+        self._last_leak: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until ``amount`` fits in the budget, then spend it."""
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            # asyncio locks are bound to the loop they are first used on
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        
+        async with self._lock:
+            while True:
+                self._leak(loop.time())
+                if self._level + amount <= self.max_rate or self._level == 0:
+                    self._level += amount
+                    return
+                excess = self._level + amount - self.max_rate
+                await asyncio.sleep(excess * self.time_period / self.max_rate)
+    
+    def consume(self, amount: float) -> None:
+        """Spend ``amount`` without waiting, e.g. once the real cost is known.
+        
+        A negative ``amount`` hands back part of an earlier overestimate.
+        """
+        self._leak(asyncio.get_running_loop().time())
+        self._level = max(0.0, self._level + amount)
+    
+    def _leak(self, now: float) -> None:
+        if self._last_leak is not None:
+            drained = (now - self._last_leak) * self.max_rate / self.time_period
+            self._level = max(0.0, self._level - drained)
+        self._last_leak = now
+    
+    async def __aenter__(self) -> None:
+        await self.acquire()
+    
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def get_groq_service() -> "GroqLLMService":
+    """Return the process-wide Groq service, creating it on first use."""
+    return GroqLLMService()
+
+
+class GroqLLMService:
+    """LLM service using Groq for code generation."""
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        structured_output: bool = True,
+        max_retries: int = 5,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None
+    ):
+        """Initialize the Groq LLM service.
+        
+        With ``structured_output`` the model is asked for a JSON object
+        (Groq JSON mode) instead of a free-form script, so no delimiter
+        extraction is needed. Free-form responses are still handled.
+        
+        ``max_retries`` is handed to the Groq clients, which retry
+        connection errors, 408/409/429 and 5xx responses with exponential
+        backoff and jitter, honoring ``retry-after`` headers.
+        
+        Async calls are paced to ``GROQ_RPM`` requests per minute (default
+        300) and, when set, ``GROQ_TPM`` tokens per minute, so large
+        concurrent batches stay under the account limits instead of
+        tripping 429s. Each request reserves its prompt plus ``max_tokens``
+        up front and is settled with the reported usage afterwards.
+        
+        ``max_tokens`` caps each completion (``DEFAULT_MAX_TOKENS``, or
+        ``JSON_MAX_TOKENS`` in JSON mode) and ``stop`` ends free-form
+        responses right after the script instead of letting the model run
+        on. Stop sequences are not sent in JSON mode, where cutting the
+        object short would make it unparseable. A response cut off at
+        ``max_tokens`` is rejected rather than turned into a broken script.
+        """
+        self.api_key = api_key or os.environ.get("GROQ_API_KEY")
+        if not self.api_key:
+            raise ValueError("GROQ_API_KEY environment variable is required")
+        
+        self.client = Groq(
+            api_key=self.api_key,
+            max_retries=max_retries,
+            http_client=DefaultHttpxClient(limits=_HTTP_LIMITS)
+        )
+        self.aclient = AsyncGroq(
+            api_key=self.api_key,
+            max_retries=max_retries,
+            http_client=DefaultAsyncHttpxClient(limits=_HTTP_LIMITS)
+        )
+        self.model = "llama-3.3-70b-versatile"
+        self.structured_output = structured_output
+        if max_tokens is None:
+            max_tokens = JSON_MAX_TOKENS if structured_output else DEFAULT_MAX_TOKENS
+        self.max_tokens = max_tokens
+        self.stop = list(DEFAULT_STOP) if stop is None else stop
+        
+        self._request_limiter = AsyncRateLimiter(int(os.environ.get("GROQ_RPM", 300)), 60)
+        tpm = os.environ.get("GROQ_TPM")
+        self._token_limiter = AsyncRateLimiter(int(tpm), 60) if tpm else None
+    
+    def generate_script(self, prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Generate a script using Groq LLM."""
+        context = context or {}
+        
+        try:
+            args = self._completion_args(prompt, context)
+            if self.structured_output:
+                response = self.client.chat.completions.create(**args)
+                self._check_finish_reason(response.choices[0].finish_reason)
+                content = response.choices[0].message.content
+            else:
+                stream = self.client.chat.completions.create(**args, stream=True)
+                content = ""
+                try:
+                    for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            content += delta
+                            if self._is_complete(content, len(delta)):
+                                break
+                        if chunk.choices:
+                            self._check_finish_reason(chunk.choices[0].finish_reason)
+                finally:
+                    stream.close()
+            return self._build_result(content, prompt, context)
+        except Exception as e:
+            raise Exception(f"Failed to generate script with Groq: {str(e)}")
+    
+    async def agenerate_script(self, prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Generate a script using Groq LLM without blocking the event loop."""
+        context = context or {}
+        
+        try:
+            args = self._completion_args(prompt, context)
+            estimate = self._estimate_tokens(args)
+            if self._token_limiter is not None:
+                # Reserve the worst case before the call, so concurrent
+                # requests cannot all start before any usage is recorded
+                await self._token_limiter.acquire(estimate)
+            await self._request_limiter.acquire()
+            
+            if self.structured_output:
+                response = await self.aclient.chat.completions.create(**args)
+                self._check_finish_reason(response.choices[0].finish_reason)
+                content = response.choices[0].message.content
+                if self._token_limiter is not None and response.usage is not None:
+                    # Settle the reservation with the actual usage
+                    self._token_limiter.consume(response.usage.total_tokens - estimate)
+            else:
+                # Streamed responses keep the reserved estimate as their cost
+                stream = await self.aclient.chat.completions.create(**args, stream=True)
+                content = ""
+                try:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            content += delta
+                            if self._is_complete(content, len(delta)):
+                                break
+                        if chunk.choices:
+                            self._check_finish_reason(chunk.choices[0].finish_reason)
+                finally:
+                    await stream.close()
+            return self._build_result(content, prompt, context)
+        except Exception as e:
+            raise Exception(f"Failed to generate script with Groq: {str(e)}")
+    
+    def _completion_args(self, prompt: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat completion arguments for a generation request."""
         user_prompt = f"""Generate a Python script for: {prompt}
 
 Context: {context}
@@ -81,71 +316,179 @@ Make sure to:
 - Handle edge cases and errors
 - Make the code clean and well-documented"""
 
-        try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                model=self.model,
-                temperature=0.1,  # Low temperature for more deterministic code
-                max_tokens=4000
-            )
-            
-            content = response.choices[0].message.content
-            
-            # Extract script from delimiters
+        args = {
+            "messages": [
+                {"role": "system", "content": _JSON_SYSTEM_PROMPT if self.structured_output else _SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            "model": self.model,
+            "temperature": 0.1,  # Low temperature for more deterministic code
+            "max_tokens": self.max_tokens
+        }
+        if self.structured_output:
+            args["response_format"] = {"type": "json_object"}
+        elif self.stop:
+            args["stop"] = self.stop
+        return args
+    
+    def _build_result(self, content: str, prompt: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn raw LLM output into script, requirements, readme and metadata."""
+        if self.structured_output:
+            # JSON mode: metadata comes straight from the response fields.
+            # The JSON text is never handed to the free-form extraction,
+            # which would find the header inside the escaped string.
+            parsed = self._parse_structured(content)
+            if parsed is None:
+                raise ValueError("No valid script object found in LLM JSON response")
+            deps, network, deterministic, script = parsed
+            metadata = {
+                "language": "python",
+                "entry": "script.py",
+                "deps": ",".join(deps),
+                "network": network,
+                "deterministic": deterministic,
+                "template_version": "1.0.0"
+            }
+            if not script.startswith(_HEADER_OPEN):
+                script = self._format_header(metadata["deps"], network) + script
+        else:
+            # Free-form: extract script from delimiters
             script = self._extract_script(content)
             if not script:
                 raise ValueError("No valid script found in LLM response")
             
             # Add Capibara header if not present
-            if not script.startswith("# --- CAPIBARA ---"):
+            if not script.startswith(_HEADER_OPEN):
                 script = self._add_capibara_header(script, prompt, context)
             
             # Parse metadata from script
             metadata = self._parse_metadata(script)
-            
-            # Generate requirements and readme
-            requirements = self._generate_requirements(metadata.get("deps", ""))
-            readme = self._generate_readme(prompt, script, metadata)
-            
-            return {
-                "script": script,
-                "requirements": requirements,
-                "readme": readme,
-                "metadata": metadata,
-                "outputs": self._infer_outputs(script)
-            }
-            
-        except Exception as e:
-            raise Exception(f"Failed to generate script with Groq: {str(e)}")
+            deps = self._parse_deps(metadata.get("deps", ""))
+        
+        # Generate requirements and readme
+        requirements = "\n".join(deps)
+        readme = self._generate_readme(prompt, script, requirements)
+        
+        return {
+            "script": script,
+            "deps": deps,
+            "requirements": requirements,
+            "readme": readme,
+            "metadata": metadata,
+            "outputs": self._infer_outputs(script)
+        }
+    
+    def _estimate_tokens(self, args: Dict[str, Any]) -> int:
+        """Estimate a request's token cost: its prompt plus the completion cap."""
+        prompt_chars = sum(len(message["content"]) for message in args["messages"])
+        return prompt_chars // 4 + args["max_tokens"]
+    
+    def _check_finish_reason(self, finish_reason: Optional[str]) -> None:
+        """Reject a completion that was cut off at ``max_tokens``."""
+        if finish_reason == "length":
+            raise ValueError(f"LLM response was truncated at max_tokens={self.max_tokens}")
+    
+    def _is_complete(self, content: str, delta_length: int) -> bool:
+        """Check whether a streamed response already holds the whole script.
+        
+        Only the newly received tail is scanned for a closing marker, so the
+        full-buffer searches run once per marker rather than once per chunk.
+        """
+        tail = content[-(delta_length + len(_END_MARKER)):]
+        if _END_MARKER in tail and self._find_delimited(content) is not None:
+            return True
+        if "```" in tail and _CODEBLOCK_RE.search(content) is not None:
+            return True
+        
+        # Header-only format the system prompt asks for: the script is done
+        # once a non-indented line arrives right after the __main__ guard's
+        # body. Otherwise the stop sequence or the end of the stream ends it.
+        dedent = _DEDENT_RE.search(content, max(0, len(content) - delta_length - 1))
+        if dedent is None:
+            return False
+        guard = content.rfind("if __name__", 0, dedent.start())
+        if guard == -1:
+            return False
+        match = _MAIN_GUARD_RE.match(content, guard)
+        return (
+            match is not None
+            and match.end() == dedent.end()
+            and _HEADER_CLOSE in content[:guard]
+        )
+    
+    def _find_delimited(self, content: str) -> Optional[str]:
+        """Return the text between CAPIBARA_START and CAPIBARA_END, if present."""
+        start = content.find(_START_MARKER)
+        if start == -1:
+            return None
+        end = content.find(_END_MARKER, start + len(_START_MARKER))
+        if end == -1:
+            return None
+        return content[start + len(_START_MARKER):end]
+    
+    def _find_header(self, content: str) -> Optional[Tuple[str, int]]:
+        """Return the Capibara header body and the offset just past the header."""
+        start = content.find(_HEADER_OPEN)
+        if start == -1:
+            return None
+        end = content.find(_HEADER_CLOSE, start + len(_HEADER_OPEN))
+        if end == -1:
+            return None
+        return content[start + len(_HEADER_OPEN):end].strip(), end + len(_HEADER_CLOSE)
+    
+    def _parse_structured(self, content: str) -> Optional[Tuple[List[str], bool, bool, str]]:
+        """Parse a JSON-mode response into (deps, network, deterministic, script)."""
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get("script"), str) or not data["script"].strip():
+            return None
+        
+        deps = data.get("deps") or []
+        if isinstance(deps, str):
+            deps = self._parse_deps(deps)
+        else:
+            deps = [str(dep).strip() for dep in deps if str(dep).strip()]
+        
+        network = data.get("network", False)
+        if isinstance(network, str):
+            network = network.lower() == "true"
+        
+        deterministic = data.get("deterministic", False)
+        if isinstance(deterministic, str):
+            deterministic = deterministic.lower() == "true"
+        
+        return deps, bool(network), bool(deterministic), data["script"].strip()
     
     def _extract_script(self, content: str) -> Optional[str]:
         """Extract script content between delimiters."""
         # Look for the script between delimiters
-        start_pattern = r"# --- CAPIBARA_START ---"
-        end_pattern = r"# --- CAPIBARA_END ---"
-        
-        start_match = re.search(start_pattern, content)
-        end_match = re.search(end_pattern, content)
-        
-        if start_match and end_match:
-            return content[start_match.end():end_match.start()].strip()
+        delimited = self._find_delimited(content)
+        if delimited is not None:
+            return delimited.strip()
         
         # Fallback: look for code blocks
-        code_block_pattern = r"```python\s*(.*?)\s*```"
-        match = re.search(code_block_pattern, content, re.DOTALL)
+        match = _CODEBLOCK_RE.search(content) or _OPEN_CODEBLOCK_RE.search(content)
         if match:
             return match.group(1).strip()
         
+        # The end delimiter is a stop sequence, so it can be cut off
+        start = content.find(_START_MARKER)
+        if start != -1:
+            return content[start + len(_START_MARKER):].strip()
+        
         # Look for Capibara header and extract everything after it
-        header_pattern = r"# --- CAPIBARA ---\s*(.*?)\s*# --- /CAPIBARA ---"
-        header_match = re.search(header_pattern, content, re.DOTALL)
-        if header_match:
-            # Return everything after the header
-            header_end = header_match.end()
-            return content[header_end:].strip()
+        header = self._find_header(content)
+        if header is not None:
+            # Return everything after the header, up to the end of the
+            # __main__ guard where a streamed response may run one line past
+            script = content[header[1]:]
+            guard = script.rfind("if __name__")
+            match = _MAIN_GUARD_RE.match(script, guard) if guard != -1 else None
+            if match is not None:
+                script = script[:match.end()]
+            return script.strip()
         
         # Last resort: return the whole content if it looks like Python
         if "def main():" in content and "if __name__ == \"__main__\":" in content:
@@ -156,43 +499,22 @@ Make sure to:
     def _add_capibara_header(self, script: str, prompt: str, context: Dict[str, Any]) -> str:
         """Add Capibara header to script if not present."""
         # Analyze script to determine dependencies and network usage
-        deps = []
-        network_required = False
-        
-        # Check for common dependencies
-        if "import requests" in script or "from requests" in script:
-            deps.append("requests==2.31.0")
-            network_required = True
-        if "import pandas" in script or "from pandas" in script:
-            deps.append("pandas==2.0.0")
-        if "import numpy" in script or "from numpy" in script:
-            deps.append("numpy==1.24.0")
-        if "import pillow" in script or "from PIL" in script:
-            deps.append("pillow==10.0.0")
-        if "import matplotlib" in script or "from matplotlib" in script:
-            deps.append("matplotlib==3.7.0")
-        if "import opencv" in script or "import cv2" in script:
-            deps.append("opencv-python==4.8.0")
+        deps = sorted({_DEPS_MAP[m.group(1)] for m in _DEP_RE.finditer(script)})
+        network_required = "requests==2.31.0" in deps or _NET_RE.search(script) is not None
         
-        # Check for network usage patterns
-        if any(pattern in script.lower() for pattern in ["http", "api", "url", "request", "fetch", "download"]):
-            network_required = True
-        
-        # Build dependencies string
-        deps_str = ",".join(deps) if deps else ""
-        
-        # Create header
-        header = f"""# --- CAPIBARA ---
+        return self._format_header(",".join(deps), network_required) + script
+    
+    def _format_header(self, deps: str, network: bool) -> str:
+        """Render the Capibara header block."""
+        return f"""{_HEADER_OPEN}
 # language: python
 # entry: script.py
-# deps: {deps_str}
-# network: {str(network_required).lower()}
+# deps: {deps}
+# network: {str(network).lower()}
 # template_version: 1.0.0
-# --- /CAPIBARA ---
+{_HEADER_CLOSE}
 
 """
-        
-        return header + script
     
     def _parse_metadata(self, script: str) -> Dict[str, Any]:
         """Parse Capibara metadata from script header."""
@@ -201,21 +523,18 @@ Make sure to:
             "entry": "script.py",
             "deps": "",
             "network": False,
+            "deterministic": False,
             "template_version": "1.0.0"
         }
         
         # Extract metadata from header
-        header_pattern = r"# --- CAPIBARA ---\s*(.*?)\s*# --- /CAPIBARA ---"
-        header_match = re.search(header_pattern, script, re.DOTALL)
+        header = self._find_header(script)
         
-        if header_match:
-            header_content = header_match.group(1)
-            for line in header_content.split('\n'):
-                line = line.strip()
-                if line.startswith('#') and ':' in line:
-                    key, value = line[1:].split(':', 1)
-                    key = key.strip()
-                    value = value.strip()
+        if header is not None:
+            for line in header[0].splitlines():
+                kv_match = _KV_RE.match(line.strip())
+                if kv_match:
+                    key, value = kv_match.group(1), kv_match.group(2).strip()
                     
                     if key == "language":
                         metadata["language"] = value
@@ -225,21 +544,18 @@ Make sure to:
                         metadata["deps"] = value
                     elif key == "network":
                         metadata["network"] = value.lower() == "true"
+                    elif key == "deterministic":
+                        metadata["deterministic"] = value.lower() == "true"
                     elif key == "template_version":
                         metadata["template_version"] = value
         
         return metadata
     
-    def _generate_requirements(self, deps: str) -> str:
-        """Generate requirements.txt content from dependencies."""
-        if not deps:
-            return ""
-        
-        # Split by comma and clean up
-        packages = [dep.strip() for dep in deps.split(',') if dep.strip()]
-        return '\n'.join(packages)
+    def _parse_deps(self, deps: str) -> List[str]:
+        """Split the comma-separated header deps into requirement strings."""
+        return [dep.strip() for dep in deps.split(',') if dep.strip()]
     
-    def _generate_readme(self, prompt: str, script: str, metadata: Dict[str, Any]) -> str:
+    def _generate_readme(self, prompt: str, script: str, requirements: str) -> str:
         """Generate README.md content."""
         readme = f"""# Generated Script
 
@@ -253,7 +569,7 @@ python script.py '{{"your": "context", "here": "data"}}'
 
 ## Dependencies
 
-{self._generate_requirements(metadata.get("deps", "")) or "No external dependencies required"}
+{requirements or "No external dependencies required"}
 
 ## Features
 
@@ -274,14 +590,18 @@ The script returns JSON with the following structure:
     
     def _infer_outputs(self, script: str) -> Dict[str, str]:
         """Infer output types from the script content."""
-        outputs = {}
-        
-        # Look for common output patterns
-        if "artifacts" in script:
-            outputs["artifacts"] = "list[str]"
-        if "output" in script:
-            outputs["output"] = "dict"
-        if "raw" in script:
-            outputs["raw"] = "dict"
+        try:
+            tree = ast.parse(script)
+        except SyntaxError:
+            # Not valid Python; fall back to a plain substring check
+            found = {key for key in _OUTPUT_TYPES if key in script}
+        else:
+            # Only string literals count (result dict keys), not names,
+            # comments or words that merely contain "output"
+            found = {
+                node.value
+                for node in ast.walk(tree)
+                if isinstance(node, ast.Constant) and node.value in _OUTPUT_TYPES
+            }
         
-        return outputs
+        return {key: value for key, value in _OUTPUT_TYPES.items() if key in found}
@@ -1,13 +1,21 @@
 """Data models for Capibara Core."""
 
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+
+def _utcnow() -> datetime:
+    """Return the current time as a timezone-aware UTC datetime."""
+    return datetime.now(timezone.utc)
 
 
 class GenerationRequest(BaseModel):
     """Request to generate a script from a prompt."""
     
+    # Build validators on first use rather than at import time
+    model_config = ConfigDict(defer_build=True)
+    
     prompt: str = Field(..., description="Natural language prompt describing the task")
     context: Dict[str, Any] = Field(default_factory=dict, description="Context data for the task")
     language: str = Field(default="python", description="Target programming language")
@@ -17,6 +25,8 @@ class GenerationRequest(BaseModel):
 class ScriptManifest(BaseModel):
     """Manifest for a generated script."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     fingerprint: str = Field(..., description="Unique fingerprint for this script")
     prompt_sha: str = Field(..., description="SHA hash of normalized prompt")
     context_sha: str = Field(..., description="SHA hash of normalized context")
@@ -29,14 +39,17 @@ class ScriptManifest(BaseModel):
         description="Security permissions"
     )
     template_version: str = Field(..., description="Template version used")
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="Creation timestamp")
+    created_at: datetime = Field(default_factory=_utcnow, description="Creation timestamp")
     outputs: Dict[str, str] = Field(default_factory=dict, description="Expected output types")
     aliases: Dict[str, str] = Field(default_factory=dict, description="Field aliases")
+    deterministic: bool = Field(default=False, description="Whether output depends only on the context")
 
 
 class GenerationResponse(BaseModel):
     """Response from script generation."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     status: str = Field(..., description="Generation status")
     script: str = Field(..., description="Generated script content")
     manifest: ScriptManifest = Field(..., description="Script manifest")
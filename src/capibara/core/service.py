@@ -1,13 +1,14 @@
 """Capibara Core service implementation."""
 
-import hashlib
-import json
+import asyncio
 import os
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any
+from functools import cached_property
+from typing import Dict, Any, List, Optional, Tuple
 
+from ..utils.fingerprint import fingerprint_bundle
 from .models import GenerationRequest, GenerationResponse, ScriptManifest, UpdateRequest, UpdateResponse
-from .llm_service import GroqLLMService
 
 
 class CapibaraCore:
@@ -17,63 +18,166 @@ class CapibaraCore:
         """Initialize Capibara Core service."""
         self.template_version = "1.0.0"
         
-        # Use Groq LLM service
+        # In-process LRU of successful responses keyed by fingerprint
+        self._cache: "OrderedDict[str, GenerationResponse]" = OrderedDict()
+        self._cache_max = 1024
+        
+        # Use Groq LLM service; the client itself is created on first use
         if not os.environ.get("GROQ_API_KEY"):
             raise ValueError("GROQ_API_KEY environment variable is required. Please set your Groq API key.")
-        
+    
+    @cached_property
+    def llm(self):
+        """LLM service used for generation, created on first access."""
         try:
-            self.llm = GroqLLMService()
+            # CAPIBARA_BATCH_MODE=groq routes async generation through the Batch API
+            if os.environ.get("CAPIBARA_BATCH_MODE") == "groq":
+                from .llm_batch_service import GroqBatchLLMService
+                return GroqBatchLLMService()
+            
+            from .llm_service import get_groq_service
+            return get_groq_service()
         except Exception as e:
             raise Exception(f"Failed to initialize Groq LLM: {e}")
     
-    def generate_script(self, request: GenerationRequest) -> GenerationResponse:
+    async def warmup(self) -> None:
+        """Create the LLM client and open a connection ahead of the first request.
+        
+        Meant to be awaited from a server startup hook; failures are ignored
+        since the first real request will surface them anyway.
+        """
+        try:
+            await self.llm.aclient.models.list()
+        except Exception:
+            pass
+    
+    def generate_script(self, request: GenerationRequest, use_cache: bool = True) -> GenerationResponse:
         """Generate a script from a prompt and context."""
         try:
+            hashes = self._compute_hashes(request)
+            cached = self._cache_get(hashes[0]) if use_cache else None
+            if cached is not None:
+                return cached
+            
             # Generate script using Groq LLM
             result = self.llm.generate_script(request.prompt, request.context)
+            return self._cache_put(self._build_response(request, result, hashes))
+        except Exception as e:
+            return self._error_response(request, e)
+    
+    async def agenerate_script(self, request: GenerationRequest, use_cache: bool = True) -> GenerationResponse:
+        """Generate a script from a prompt and context asynchronously."""
+        try:
+            hashes = self._compute_hashes(request)
+            cached = self._cache_get(hashes[0]) if use_cache else None
+            if cached is not None:
+                return cached
             
-            # Generate fingerprint
-            fingerprint = self._generate_fingerprint(request)
-            
-            # Create manifest
-            manifest = ScriptManifest(
-                fingerprint=fingerprint,
-                prompt_sha=self._hash_prompt(request.prompt),
-                context_sha=self._hash_context(request.context),
+            result = await self.llm.agenerate_script(request.prompt, request.context)
+            return self._cache_put(self._build_response(request, result, hashes))
+        except Exception as e:
+            return self._error_response(request, e)
+    
+    async def agenerate_scripts(
+        self,
+        requests: List[GenerationRequest],
+        max_concurrency: int = 8
+    ) -> List[GenerationResponse]:
+        """Generate scripts for several requests concurrently.
+        
+        Responses are returned in request order; failures are reported as
+        error responses rather than raised.
+        """
+        from .llm_batch_service import GroqBatchLLMService
+        
+        if isinstance(self.llm, GroqBatchLLMService):
+            # Batch jobs collect requests server-side; throttling submission
+            # would only split them into many small batches.
+            max_concurrency = max(len(requests), 1)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate(request: GenerationRequest) -> GenerationResponse:
+            async with semaphore:
+                return await self.agenerate_script(request)
+        
+        results = await asyncio.gather(
+            *[generate(request) for request in requests],
+            return_exceptions=True
+        )
+        return [
+            self._error_response(request, result) if isinstance(result, BaseException) else result
+            for request, result in zip(requests, results)
+        ]
+    
+    def _cache_get(self, fingerprint: str) -> Optional[GenerationResponse]:
+        """Return a copy of a cached response, if any."""
+        cached = self._cache.get(fingerprint)
+        if cached is None:
+            return None
+        self._cache.move_to_end(fingerprint)
+        return cached.model_copy(deep=True)
+    
+    def _cache_put(self, response: GenerationResponse) -> GenerationResponse:
+        """Store a successful response and return it."""
+        self._cache[response.manifest.fingerprint] = response.model_copy(deep=True)
+        self._cache.move_to_end(response.manifest.fingerprint)
+        while len(self._cache) > self._cache_max:
+            self._cache.popitem(last=False)
+        return response
+    
+    def _build_response(
+        self,
+        request: GenerationRequest,
+        result: Dict[str, Any],
+        hashes: Tuple[str, str, str]
+    ) -> GenerationResponse:
+        """Build a successful response from the LLM result."""
+        fingerprint, prompt_sha, context_sha = hashes
+        metadata = result.get("metadata", {})
+        network = metadata.get("network", "requests" in result["requirements"])
+        
+        # Create manifest
+        manifest = ScriptManifest(
+            fingerprint=fingerprint,
+            prompt_sha=prompt_sha,
+            context_sha=context_sha,
+            language=request.language,
+            entry="script.py",
+            runtime={"python": "3.11"},
+            deps=result["deps"],
+            allow={"network": network, "fs": []},
+            template_version=self.template_version,
+            outputs=result["outputs"],
+            # A script that talks to the network can't promise a stable result
+            deterministic=bool(metadata.get("deterministic")) and not network
+        )
+        
+        return GenerationResponse(
+            status="ok",
+            script=result["script"],
+            manifest=manifest,
+            requirements=result["requirements"],
+            readme=result["readme"]
+        )
+    
+    def _error_response(self, request: GenerationRequest, error: BaseException) -> GenerationResponse:
+        """Build an error response for a failed generation."""
+        return GenerationResponse(
+            status="error",
+            script="",
+            manifest=ScriptManifest(
+                fingerprint="",
+                prompt_sha="",
+                context_sha="",
                 language=request.language,
                 entry="script.py",
                 runtime={"python": "3.11"},
-                deps=result["requirements"].split("\n") if result["requirements"] else [],
-                allow={"network": result.get("metadata", {}).get("network", "requests" in result["requirements"]), "fs": []},
-                template_version=self.template_version,
-                outputs=result["outputs"]
-            )
-            
-            return GenerationResponse(
-                status="ok",
-                script=result["script"],
-                manifest=manifest,
-                requirements=result["requirements"],
-                readme=result["readme"]
-            )
-            
-        except Exception as e:
-            return GenerationResponse(
-                status="error",
-                script="",
-                manifest=ScriptManifest(
-                    fingerprint="",
-                    prompt_sha="",
-                    context_sha="",
-                    language=request.language,
-                    entry="script.py",
-                    runtime={"python": "3.11"},
-                    template_version=self.template_version
-                ),
-                requirements="",
-                readme="",
-                error=str(e)
-            )
+                template_version=self.template_version
+            ),
+            requirements="",
+            readme="",
+            error=str(error)
+        )
     
     def check_updates(self, request: UpdateRequest) -> UpdateResponse:
         """Check if a script needs updates."""
@@ -88,17 +192,10 @@ class CapibaraCore:
             new_fingerprint=None
         )
     
-    def _generate_fingerprint(self, request: GenerationRequest) -> str:
-        """Generate a fingerprint for the request."""
-        content = f"{request.prompt}|{json.dumps(request.context, sort_keys=True)}|{request.language}|{self.template_version}"
-        return hashlib.sha256(content.encode()).hexdigest()[:16]
-    
-    def _hash_prompt(self, prompt: str) -> str:
-        """Hash the normalized prompt."""
-        normalized = prompt.lower().strip()
-        return hashlib.sha256(normalized.encode()).hexdigest()[:16]
-    
-    def _hash_context(self, context: Dict[str, Any]) -> str:
-        """Hash the normalized context."""
-        normalized = json.dumps(context, sort_keys=True)
-        return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+    def _compute_hashes(self, request: GenerationRequest) -> Tuple[str, str, str]:
+        """Compute (fingerprint, prompt_sha, context_sha) for a request.
+        
+        Uses the same fingerprint as the SDK, so the manifest fingerprint
+        matches the name of the script's cache directory.
+        """
+        return fingerprint_bundle(request.prompt, request.context, request.language, self.template_version)
@@ -1,14 +1,39 @@
 """Capibara SDK client for script execution."""
 
+import copy
 import json
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
 from ..core.service import CapibaraCore
+from ..utils import fastjson
 from ..utils.fingerprint import generate_fingerprint
 from ..utils.runner import ScriptRunner
 
 
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write a file via a temporary sibling so readers never see it half written."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb", buffering=128 * 1024) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _select_output(result: Dict[str, Any], select: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the selected output fields that the script produced."""
+    if select and result.get("output"):
+        selected = frozenset(select)
+        result["output"] = {key: value for key, value in result["output"].items() if key in selected}
+    return result
+
+
 class CapibaraResult:
     """Result object from script execution."""
     
@@ -44,6 +69,11 @@ class Capibara:
             raise Exception(f"Failed to initialize Capibara Core: {e}")
         
         self.runner = ScriptRunner(self.work_dir)
+        
+        # Results of deterministic scripts, keyed by fingerprint (which
+        # already covers the canonical context)
+        self._result_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._result_cache_max = 256
     
     def run(
         self,
@@ -61,18 +91,30 @@ class Capibara:
         fingerprint = generate_fingerprint(prompt, context, language)
         script_dir = self.cache_dir / fingerprint
         
+        # Reuse the last result of a deterministic script for the same context
+        if refresh:
+            self._result_cache.pop(fingerprint, None)
+        elif fingerprint in self._result_cache:
+            self._result_cache.move_to_end(fingerprint)
+            result = copy.deepcopy(self._result_cache[fingerprint])
+            return CapibaraResult(_select_output(result, select))
+        
+        # Serialize the context for the script once, whichever path runs it
+        context_json = fastjson.dumps(context)
+        
         # Check if script exists in cache
         if not refresh and script_dir.exists() and (script_dir / "manifest.json").exists():
-            return self._run_cached_script(script_dir, context, select)
+            return self._run_cached_script(script_dir, context, select, context_json)
         
         # Generate new script
-        return self._generate_and_run_script(prompt, context, select, language, script_dir)
+        return self._generate_and_run_script(prompt, context, select, language, script_dir, refresh, context_json)
     
     def _run_cached_script(
         self,
         script_dir: Path,
         context: Dict[str, Any],
-        select: Optional[List[str]] = None
+        select: Optional[List[str]] = None,
+        context_json: Optional[str] = None
     ) -> CapibaraResult:
         """Run a cached script."""
         try:
@@ -81,11 +123,13 @@ class Capibara:
             if not manifest_path.exists():
                 raise FileNotFoundError("Manifest not found")
             
-            manifest = json.loads(manifest_path.read_text())
+            manifest = fastjson.loads(manifest_path.read_bytes())
             
             # Run script
             script_path = script_dir / manifest["entry"]
-            success, result, error = self.runner.run_script(script_path, context, manifest)
+            success, result, error = self.runner.run_script(script_path, context, manifest, context_json=context_json)
+            if success:
+                self._remember_result(script_dir.name, manifest, result)
             
             if not success:
                 return CapibaraResult({
@@ -97,11 +141,7 @@ class Capibara:
                 })
             
             # Apply field selection if requested
-            if select and result.get("output"):
-                filtered_output = {key: result["output"].get(key) for key in select}
-                result["output"] = filtered_output
-            
-            return CapibaraResult(result)
+            return CapibaraResult(_select_output(result, select))
             
         except Exception as e:
             return CapibaraResult({
@@ -118,7 +158,9 @@ class Capibara:
         context: Dict[str, Any],
         select: Optional[List[str]] = None,
         language: str = "python",
-        script_dir: Path = None
+        script_dir: Path = None,
+        refresh: bool = False,
+        context_json: Optional[str] = None
     ) -> CapibaraResult:
         """Generate a new script and run it."""
         try:
@@ -130,7 +172,7 @@ class Capibara:
                 language=language
             )
             
-            response = self.core.generate_script(request)
+            response = self.core.generate_script(request, use_cache=not refresh)
             
             if response.status != "ok":
                 return CapibaraResult({
@@ -153,7 +195,10 @@ class Capibara:
             
             # Run the script
             script_path = script_dir / response.manifest.entry
-            success, result, error = self.runner.run_script(script_path, context, response.manifest.model_dump())
+            manifest = response.manifest.model_dump()
+            success, result, error = self.runner.run_script(script_path, context, manifest, context_json=context_json)
+            if success:
+                self._remember_result(script_dir.name, manifest, result)
             
             if not success:
                 return CapibaraResult({
@@ -165,11 +210,7 @@ class Capibara:
                 })
             
             # Apply field selection if requested
-            if select and result.get("output"):
-                filtered_output = {key: result["output"].get(key) for key in select}
-                result["output"] = filtered_output
-            
-            return CapibaraResult(result)
+            return CapibaraResult(_select_output(result, select))
             
         except Exception as e:
             return CapibaraResult({
@@ -180,45 +221,57 @@ class Capibara:
                 "raw": {"error": str(e)}
             })
     
+    def _remember_result(self, fingerprint: str, manifest: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Keep a successful result of a deterministic script for reuse."""
+        if not manifest.get("deterministic") or result.get("status") != "ok":
+            return
+        self._result_cache[fingerprint] = copy.deepcopy(result)
+        self._result_cache.move_to_end(fingerprint)
+        if len(self._result_cache) > self._result_cache_max:
+            self._result_cache.popitem(last=False)
+    
     def _save_artifacts(self, script_dir: Path, response) -> None:
         """Save generated artifacts to the script directory."""
         # Save script
         script_path = script_dir / response.manifest.entry
-        script_path.write_text(response.script)
-        
-        # Save manifest
-        manifest_path = script_dir / "manifest.json"
-        manifest_path.write_text(response.manifest.model_dump_json(indent=2))
+        _write_atomic(script_path, response.script.encode())
         
         # Save requirements
         if response.requirements:
             requirements_path = script_dir / "requirements.txt"
-            requirements_path.write_text(response.requirements)
+            _write_atomic(requirements_path, response.requirements.encode())
         
         # Save README
         if response.readme:
             readme_path = script_dir / "README.md"
-            readme_path.write_text(response.readme)
+            _write_atomic(readme_path, response.readme.encode())
+        
+        # Save manifest last: run() treats its presence as a complete entry
+        manifest_path = script_dir / "manifest.json"
+        _write_atomic(manifest_path, response.manifest.model_dump_json(indent=2).encode())
     
     def list_scripts(self) -> List[Dict[str, Any]]:
         """List all cached scripts."""
         scripts = []
         
-        for script_dir in self.cache_dir.iterdir():
-            if script_dir.is_dir():
-                manifest_path = script_dir / "manifest.json"
-                if manifest_path.exists():
-                    try:
-                        manifest = json.loads(manifest_path.read_text())
-                        scripts.append({
-                            "fingerprint": manifest["fingerprint"],
-                            "prompt_sha": manifest["prompt_sha"],
-                            "language": manifest["language"],
-                            "created_at": manifest["created_at"],
-                            "deps": manifest.get("deps", [])
-                        })
-                    except (json.JSONDecodeError, KeyError):
-                        continue
+        # DirEntry caches the entry type, and a missing manifest is handled by
+        # the failed read rather than a separate exists() check
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                try:
+                    with open(os.path.join(entry.path, "manifest.json"), "rb") as f:
+                        manifest = fastjson.loads(f.read())
+                    scripts.append({
+                        "fingerprint": manifest["fingerprint"],
+                        "prompt_sha": manifest["prompt_sha"],
+                        "language": manifest["language"],
+                        "created_at": manifest["created_at"],
+                        "deps": manifest.get("deps", [])
+                    })
+                except (OSError, json.JSONDecodeError, KeyError):
+                    continue
         
         return scripts
     
@@ -228,3 +281,4 @@ class Capibara:
         if self.cache_dir.exists():
             shutil.rmtree(self.cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._result_cache.clear()
@@ -1,10 +1,11 @@
 """Capibara utilities - Common helper functions."""
 
-from .fingerprint import generate_fingerprint, normalize_prompt, normalize_context
+from .fingerprint import fingerprint_bundle, generate_fingerprint, normalize_prompt, normalize_context
 from .security import SecurityManager
 from .runner import ScriptRunner
 
 __all__ = [
+    "fingerprint_bundle",
     "generate_fingerprint",
     "normalize_prompt", 
     "normalize_context",
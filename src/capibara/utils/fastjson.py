@@ -0,0 +1,27 @@
+"""JSON helpers that use orjson when it is installed."""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON from a string or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """Serialize an object to a JSON string."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # orjson rejects some values stdlib json accepts (e.g. huge ints)
+            pass
+    return json.dumps(obj)
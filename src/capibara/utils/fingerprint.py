@@ -1,35 +1,36 @@
 """Fingerprinting utilities for script caching."""
 
+import functools
 import hashlib
 import json
 import re
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 
+# Common request phrasing that does not change what the script should do
+_STOPWORD_RE = re.compile(
+    r"\b(?:please|can you|could you|would you|i need|i want|help me|create|make|generate|build|write)\b"
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# json.dumps builds a new encoder whenever options are passed, so keep one.
+# Contexts are plain JSON data, which makes the circular-reference check
+# redundant.
+_CONTEXT_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'), check_circular=False)
+
+
+@functools.lru_cache(maxsize=2048)
 def normalize_prompt(prompt: str) -> str:
     """Normalize a prompt for consistent fingerprinting."""
-    # Convert to lowercase
-    normalized = prompt.lower()
-    
-    # Remove common stopwords
-    stopwords = {
-        "please", "can you", "could you", "would you", "i need", "i want",
-        "help me", "create", "make", "generate", "build", "write"
-    }
-    
-    for stopword in stopwords:
-        normalized = normalized.replace(stopword, "")
-    
-    # Remove extra whitespace
-    normalized = re.sub(r'\s+', ' ', normalized).strip()
-    
-    return normalized
+    # Lowercase, drop common stopwords, then collapse whitespace
+    normalized = _STOPWORD_RE.sub("", prompt.lower())
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
 
 
 def normalize_context(context: Dict[str, Any]) -> str:
     """Normalize context data for consistent fingerprinting."""
     # Sort keys and convert to JSON string
-    return json.dumps(context, sort_keys=True, separators=(',', ':'))
+    return _CONTEXT_ENCODER.encode(context)
 
 
 def generate_fingerprint(prompt: str, context: Dict[str, Any], language: str = "python", template_version: str = "1.0.0") -> str:
@@ -38,20 +39,43 @@ def generate_fingerprint(prompt: str, context: Dict[str, Any], language: str = "
     norm_prompt = normalize_prompt(prompt)
     norm_context = normalize_context(context)
     
-    # Create content string
-    content = f"{norm_prompt}|{norm_context}|{language}|{template_version}"
-    
-    # Generate hash
-    return hashlib.sha256(content.encode()).hexdigest()[:16]
+    # Feed the pieces to the hasher as "prompt|context|language|version"
+    # without building the joined string (contexts can be large)
+    hasher = hashlib.blake2b(digest_size=8)
+    hasher.update(norm_prompt.encode())
+    hasher.update(b"|")
+    hasher.update(norm_context.encode())
+    hasher.update(f"|{language}|{template_version}".encode())
+    return hasher.hexdigest()
 
 
 def generate_prompt_sha(prompt: str) -> str:
     """Generate SHA hash for normalized prompt."""
     normalized = normalize_prompt(prompt)
-    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
 
 
 def generate_context_sha(context: Dict[str, Any]) -> str:
     """Generate SHA hash for normalized context."""
     normalized = normalize_context(context)
-    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def fingerprint_bundle(prompt: str, context: Dict[str, Any], language: str = "python", template_version: str = "1.0.0") -> Tuple[str, str, str]:
+    """Generate (fingerprint, prompt_sha, context_sha) with one normalization pass.
+    
+    The values match generate_fingerprint, generate_prompt_sha and
+    generate_context_sha. The fingerprint hasher is seeded with the prompt,
+    so the prompt hash is taken from a copy of it.
+    """
+    norm_prompt = normalize_prompt(prompt).encode()
+    norm_context = normalize_context(context).encode()
+    
+    hasher = hashlib.blake2b(norm_prompt, digest_size=8)
+    prompt_sha = hasher.copy().hexdigest()
+    hasher.update(b"|")
+    hasher.update(norm_context)
+    hasher.update(f"|{language}|{template_version}".encode())
+    
+    context_sha = hashlib.blake2b(norm_context, digest_size=8).hexdigest()
+    return hasher.hexdigest(), prompt_sha, context_sha
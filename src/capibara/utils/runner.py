@@ -1,37 +1,197 @@
 """Script runner for executing generated scripts safely."""
 
+import atexit
+import hashlib
+import io
 import json
+import shutil
+import signal
 import subprocess
 import tempfile
+import threading
 import venv
+from collections import deque
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Tuple
 import sys
 import os
 
+from . import fastjson
+from .security import _EMPTY_ALLOW, SecurityManager
+
+
+WORKER_SCRIPT = Path(__file__).with_name("worker.py")
+
+# Only the tail of a subprocess's output is kept; the result is its last line
+_STDOUT_TAIL_LINES = 1000
+_STDERR_TAIL_LINES = 200
+_PIPE_BUFFER_SIZE = io.DEFAULT_BUFFER_SIZE * 16
+
+# Workers fork a child per script where the platform allows it
+_FORK = hasattr(os, "fork")
+
+
+def _python_command() -> str:
+    """Return the interpreter command used to run scripts."""
+    return "python" if sys.platform == "win32" else "python3"
+
+
+class WorkerPool:
+    """Pool of warm Python processes that run scripts without a fresh interpreter.
+
+    Workers execute ``worker.py`` and are reused across runs, so interpreter
+    startup is paid once per worker instead of once per script run. Each
+    script runs in a child forked from the worker, so state it leaves behind
+    never reaches later scripts. Idle workers are kept per interpreter, so
+    scripts with dependencies get a worker from their own virtual
+    environment. A worker that times out or dies is discarded along with
+    its process group; without ``fork`` a worker serves a single run.
+    """
+
+    def __init__(self, max_idle: int = 4):
+        self.max_idle = max_idle
+        self._idle: Dict[str, List[subprocess.Popen]] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def run(
+        self,
+        script_path: Path,
+        args: List[str],
+        env: Dict[str, str],
+        timeout: int,
+        python: Optional[str] = None,
+        cwd: Optional[Path] = None
+    ) -> Tuple[str, str]:
+        """Run a script in a worker and return its (stdout, stderr).
+        
+        The script runs in ``cwd``, or its own directory if none is given.
+        """
+        python = python or _python_command()
+        worker = self._acquire(python, env)
+        request = {
+            "script": str(script_path),
+            "cwd": str(cwd or script_path.parent),
+            "env": env,
+        }
+        # Single-line arguments (like serialized contexts) follow the request
+        # as raw lines instead of being escaped into it
+        raw_args = all("\n" not in arg and "\r" not in arg for arg in args)
+        if raw_args:
+            request["raw_args"] = len(args)
+            message = json.dumps(request) + "\n" + "".join(arg + "\n" for arg in args)
+        else:
+            request["args"] = args
+            message = json.dumps(request) + "\n"
+
+        timed_out = threading.Event()
+
+        def expire() -> None:
+            timed_out.set()
+            self._kill(worker)
+
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+        try:
+            worker.stdin.write(message)
+            worker.stdin.flush()
+            line = worker.stdout.readline()
+        except OSError:
+            line = ""
+        finally:
+            timer.cancel()
+
+        if not line:
+            self._kill(worker)
+            worker.wait()
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(str(script_path), timeout)
+            raise RuntimeError("Script worker exited unexpectedly")
+
+        self._release(python, worker)
+        response = json.loads(line)
+        return response.get("stdout", ""), response.get("stderr", "")
+
+    def close(self) -> None:
+        """Shut down all idle workers."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for worker in [worker for workers in idle.values() for worker in workers]:
+            try:
+                worker.stdin.close()
+                worker.wait(timeout=5)
+            except Exception:
+                self._kill(worker)
+
+    def _acquire(self, python: str, env: Dict[str, str]) -> subprocess.Popen:
+        with self._lock:
+            idle = self._idle.get(python, [])
+            while idle:
+                worker = idle.pop()
+                if worker.poll() is None:
+                    return worker
+        return subprocess.Popen(
+            [python, "-u", str(WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            text=True,
+            encoding="utf-8",
+            start_new_session=_FORK,
+        )
+    
+    def _kill(self, worker: subprocess.Popen) -> None:
+        """Kill a worker together with the script it may have forked."""
+        if _FORK:
+            try:
+                os.killpg(worker.pid, signal.SIGKILL)
+                return
+            except OSError:
+                pass
+        worker.kill()
+
+    def _release(self, python: str, worker: subprocess.Popen) -> None:
+        if not _FORK:
+            # The worker ran the script in-process and is exiting
+            worker.stdin.close()
+            worker.wait()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(python, [])
+            if len(idle) < self.max_idle:
+                idle.append(worker)
+                return
+        worker.stdin.close()
+
 
 class ScriptRunner:
     """Runs scripts in a sandboxed environment."""
     
     def __init__(self, work_dir: Optional[Path] = None):
         self.work_dir = work_dir or Path.cwd()
-        self.security_manager = None  # Will be imported when needed
+        self.security_manager = SecurityManager()
+        self.worker_pool = WorkerPool()
     
     def run_script(
         self,
         script_path: Path,
         context: Dict[str, Any],
         manifest: Dict[str, Any],
-        timeout: int = 300
+        timeout: int = 300,
+        context_json: Optional[str] = None
     ) -> Tuple[bool, Dict[str, Any], str]:
-        """Run a script with the given context and manifest."""
+        """Run a script with the given context and manifest.
+        
+        ``context_json`` is the context already serialized by the caller;
+        otherwise it is serialized here, once, for whichever process runs it.
+        """
         try:
-            # Import security manager here to avoid circular imports
-            from .security import SecurityManager
-            self.security_manager = SecurityManager()
+            if context_json is None:
+                context_json = fastjson.dumps(context)
             
             # Validate script security
-            script_content = script_path.read_text()
+            script_content = script_path.read_bytes()
             security_errors = self.security_manager.validate_script(script_content, manifest)
             
             if security_errors:
@@ -41,32 +201,18 @@ class ScriptRunner:
                     "errors": security_errors
                 }, ""
             
-            # Create temporary directory for execution
+            # Run the validated bytes from a scratch directory, so the cached
+            # file cannot change between validation and execution and
+            # relative output never lands next to it
             with tempfile.TemporaryDirectory() as temp_dir:
                 temp_path = Path(temp_dir)
+                run_path = temp_path / script_path.name
+                run_path.write_bytes(script_content)
                 
-                # Copy script to temp directory
-                script_name = script_path.name
-                temp_script = temp_path / script_name
-                temp_script.write_text(script_content)
-                
-                # Install dependencies if any
                 deps = manifest.get("deps", [])
-                if deps:
-                    self._install_dependencies(temp_path, deps)
-                
-                # Prepare environment
-                env = self._prepare_environment(temp_path, manifest)
-                
-                # Run script
-                result = self._execute_script(
-                    temp_script,
-                    context,
-                    env,
-                    timeout
-                )
+                venv_path = self._install_dependencies(deps) if deps else None
                 
-                return True, result, ""
+                return True, self._dispatch(run_path, temp_path, context_json, manifest, venv_path, timeout), ""
                 
         except Exception as e:
             return False, {
@@ -74,16 +220,82 @@ class ScriptRunner:
                 "message": f"Execution failed: {str(e)}"
             }, str(e)
     
-    def _install_dependencies(self, work_dir: Path, deps: List[str]) -> None:
-        """Install dependencies in a virtual environment."""
-        if not deps:
-            return
+    def _dispatch(
+        self,
+        script_path: Path,
+        work_dir: Path,
+        context_json: str,
+        manifest: Dict[str, Any],
+        venv_path: Optional[Path],
+        timeout: int
+    ) -> Dict[str, Any]:
+        """Run a validated script in ``work_dir`` and return the parsed result."""
+        env = self._prepare_environment(work_dir, manifest, venv_path)
+        
+        # Local scripts reuse a warm worker from their environment,
+        # anything needing network keeps a fresh process
+        if (manifest.get("allow") or _EMPTY_ALLOW).get("network", False):
+            return self._execute_script(script_path, work_dir, context_json, env, timeout)
+        return self._execute_in_worker(
+            script_path,
+            work_dir,
+            context_json,
+            env,
+            timeout,
+            str(self._venv_python(venv_path)) if venv_path else None
+        )
+    
+    def _install_dependencies(self, deps: List[str]) -> Path:
+        """Return a virtual environment with the dependencies installed.
+        
+        Environments are shared by every script with the same dependency set
+        and live under ``.capibara/venvs/<deps hash>``. A new one is built in
+        a scratch directory and renamed into place only once pip succeeds,
+        so an existing path is always a complete environment.
+        """
+        deps_key = hashlib.blake2b("\n".join(sorted(deps)).encode(), digest_size=12).hexdigest()
+        venvs_dir = self.work_dir / ".capibara" / "venvs"
+        venv_path = venvs_dir / deps_key
+        if (venv_path / "pyvenv.cfg").exists():
+            return venv_path
+        
+        venvs_dir.mkdir(parents=True, exist_ok=True)
+        build_path = Path(tempfile.mkdtemp(prefix=f".{deps_key}-", dir=venvs_dir))
+        try:
+            venv.create(build_path, with_pip=True)
+            result = subprocess.run(
+                [str(self._venv_python(build_path)), "-m", "pip", "install",
+                 "--disable-pip-version-check", "--quiet", *deps],
+                capture_output=True,
+                text=True,
+                timeout=900
+            )
+            if result.returncode != 0:
+                raise Exception(f"Failed to install dependencies: {result.stderr.strip()}")
+            
+            try:
+                build_path.rename(venv_path)
+            except OSError:
+                # Another run finished the same environment first
+                if not (venv_path / "pyvenv.cfg").exists():
+                    raise
+        finally:
+            shutil.rmtree(build_path, ignore_errors=True)
         
-        # For now, skip dependency installation in temporary environment
-        # This is a simplified approach - in production, you'd want proper sandboxing
-        return
+        return venv_path
     
-    def _prepare_environment(self, work_dir: Path, manifest: Dict[str, Any]) -> Dict[str, str]:
+    def _venv_python(self, venv_path: Path) -> Path:
+        """Return the interpreter of a virtual environment."""
+        if sys.platform == "win32":
+            return venv_path / "Scripts" / "python.exe"
+        return venv_path / "bin" / "python"
+    
+    def _prepare_environment(
+        self,
+        work_dir: Path,
+        manifest: Dict[str, Any],
+        venv_path: Optional[Path] = None
+    ) -> Dict[str, str]:
         """Prepare environment variables for script execution."""
         env = os.environ.copy()
         
@@ -91,76 +303,102 @@ class ScriptRunner:
         env["CAPIBARA_WORK_DIR"] = str(work_dir)
         
         # Set network permissions
-        network_allowed = manifest.get("allow", {}).get("network", False)
+        allow = manifest.get("allow") or _EMPTY_ALLOW
+        network_allowed = allow.get("network", False)
         env["CAPIBARA_NETWORK_ALLOWED"] = str(network_allowed)
         
         # Set file system permissions
-        fs_allowed = manifest.get("allow", {}).get("fs", [])
+        fs_allowed = allow.get("fs")
         if fs_allowed:
             env["CAPIBARA_FS_ALLOWED"] = ":".join(fs_allowed)
         
-        # Add virtual environment to PATH if it exists
-        venv_path = work_dir / "venv"
-        if venv_path.exists():
-            if sys.platform == "win32":
-                venv_bin = venv_path / "Scripts"
-            else:
-                venv_bin = venv_path / "bin"
-            
-            if venv_bin.exists():
-                env["PATH"] = str(venv_bin) + os.pathsep + env["PATH"]
+        # Put the dependency environment first on PATH so it provides python
+        if venv_path is not None:
+            venv_bin = self._venv_python(venv_path).parent
+            env["VIRTUAL_ENV"] = str(venv_path)
+            env["PATH"] = str(venv_bin) + os.pathsep + env["PATH"]
         
         return env
     
+    def _execute_in_worker(
+        self,
+        script_path: Path,
+        cwd: Path,
+        context_json: str,
+        env: Dict[str, str],
+        timeout: int,
+        python: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Execute the script in a pooled worker process."""
+        try:
+            stdout, stderr = self.worker_pool.run(
+                script_path,
+                [context_json],
+                env,
+                timeout,
+                python,
+                cwd
+            )
+            return self._parse_output(stdout, stderr)
+        except subprocess.TimeoutExpired:
+            return {
+                "status": "error",
+                "message": "Script execution timed out"
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Execution error: {str(e)}"
+            }
+    
     def _execute_script(
         self,
         script_path: Path,
-        context: Dict[str, Any],
+        cwd: Path,
+        context_json: str,
         env: Dict[str, str],
         timeout: int
     ) -> Dict[str, Any]:
         """Execute the script with the given context."""
-        # Prepare command
-        if sys.platform == "win32":
-            python_cmd = "python"
-        else:
-            python_cmd = "python3"
-        
-        cmd = [python_cmd, str(script_path), json.dumps(context)]
+        cmd = [_python_command(), str(script_path), context_json]
         
         try:
-            # Run script
-            result = subprocess.run(
+            # Run script, streaming its output and keeping only the tail
+            proc = subprocess.Popen(
                 cmd,
-                cwd=script_path.parent,
+                cwd=cwd,
                 env=env,
-                capture_output=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=timeout
+                bufsize=_PIPE_BUFFER_SIZE
             )
+            stderr_tail = deque(maxlen=_STDERR_TAIL_LINES)
+            stderr_reader = threading.Thread(target=stderr_tail.extend, args=(proc.stderr,), daemon=True)
+            stderr_reader.start()
             
-            # Parse output
-            if result.stdout:
-                try:
-                    # Try to parse JSON from last line
-                    lines = result.stdout.strip().split('\n')
-                    last_line = lines[-1]
-                    output = json.loads(last_line)
-                    return output
-                except json.JSONDecodeError:
-                    # If not JSON, return raw output
-                    return {
-                        "status": "ok",
-                        "artifacts": [],
-                        "output": {"raw_output": result.stdout},
-                        "raw": {"stdout": result.stdout, "stderr": result.stderr}
-                    }
-            else:
-                return {
-                    "status": "error",
-                    "message": "No output from script",
-                    "raw": {"stdout": result.stdout, "stderr": result.stderr}
-                }
+            timed_out = threading.Event()
+            
+            def expire() -> None:
+                timed_out.set()
+                proc.kill()
+            
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+            try:
+                stdout_tail = deque(proc.stdout, maxlen=_STDOUT_TAIL_LINES)
+                proc.wait()
+            finally:
+                timer.cancel()
+                stderr_reader.join()
+                proc.stdout.close()
+                proc.stderr.close()
+            
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            
+            return self._parse_output("".join(stdout_tail), "".join(stderr_tail))
                 
         except subprocess.TimeoutExpired:
             return {
@@ -172,3 +410,27 @@ class ScriptRunner:
                 "status": "error",
                 "message": f"Execution error: {str(e)}"
             }
+    
+    def _parse_output(self, stdout: str, stderr: str) -> Dict[str, Any]:
+        """Parse the JSON result printed on the script's last line."""
+        if stdout:
+            try:
+                # Try to parse JSON from last line
+                lines = stdout.strip().split('\n')
+                last_line = lines[-1]
+                output = fastjson.loads(last_line)
+                return output
+            except json.JSONDecodeError:
+                # If not JSON, return raw output
+                return {
+                    "status": "ok",
+                    "artifacts": [],
+                    "output": {"raw_output": stdout},
+                    "raw": {"stdout": stdout, "stderr": stderr}
+                }
+        else:
+            return {
+                "status": "error",
+                "message": "No output from script",
+                "raw": {"stdout": stdout, "stderr": stderr}
+            }
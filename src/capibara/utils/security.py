@@ -3,112 +3,185 @@
 import ast
 import re
 from pathlib import Path
-from typing import List, Set, Dict, Any
+from types import MappingProxyType
+from typing import List, Set, Dict, Any, Optional, Tuple, Union
+
+
+# Packages scripts may import without declaring them as dependencies
+_ALLOWED_IMPORTS = frozenset({
+    # Standard library
+    "json", "sys", "os", "pathlib", "datetime", "time", "math", "random",
+    "collections", "itertools", "functools", "operator", "re", "string",
+    "urllib", "http", "base64", "hashlib", "uuid", "tempfile", "shutil",
+    "zipfile", "tarfile", "csv", "xml", "html", "email", "logging",
+    "subprocess", "threading", "multiprocessing", "queue", "socket",
+    "ssl", "gzip", "bz2", "lzma", "pickle", "copy", "warnings",
+
+    # Common data science libraries
+    "numpy", "pandas", "matplotlib", "seaborn", "scipy", "sklearn",
+
+    # Common web libraries
+    "requests", "urllib3", "httpx",
+
+    # Common video/image libraries
+    "moviepy", "PIL", "opencv", "cv2",
+
+    # Common file formats
+    "yaml", "toml", "configparser", "argparse", "click",
+
+    # Common HTML/formatting libraries
+    "json2html", "jinja2", "markdown", "beautifulsoup4", "bs4",
+})
+
+# Calls rejected in generated scripts, by the dotted name they resolve to
+_BLOCKED_CALLS = frozenset({
+    "__import__", "exec", "eval", "compile",
+    "subprocess.run",
+    "os.system", "os.popen", "os.fork", "os.kill",
+    "os.remove", "os.unlink", "os.rmdir", "os.removedirs",
+    "shutil.rmtree", "shutil.move", "shutil.copy", "shutil.copytree",
+})
+# The os.exec* and os.spawn* families
+_BLOCKED_CALL_PREFIXES = ("os.exec", "os.spawn")
+# Builtins that stay blocked when reached through the builtins module,
+# e.g. __builtins__.exec(...) or builtins.eval(...)
+_BLOCKED_BUILTINS = frozenset({"__import__", "exec", "eval", "compile"})
+_BUILTINS_ROOTS = frozenset({"__builtins__", "builtins"})
+
+# Project name at the start of a requirement such as "Pillow[extra]>=10.0"
+_REQUIREMENT_NAME_RE = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+# Shared read-only stand-in for a manifest without an "allow" section
+_EMPTY_ALLOW = MappingProxyType({})
 
 
 class SecurityManager:
     """Manages security policies for script execution."""
     
     def __init__(self):
-        self.allowed_imports = {
-            # Standard library
-            "json", "sys", "os", "pathlib", "datetime", "time", "math", "random",
-            "collections", "itertools", "functools", "operator", "re", "string",
-            "urllib", "http", "base64", "hashlib", "uuid", "tempfile", "shutil",
-            "zipfile", "tarfile", "csv", "xml", "html", "email", "logging",
-            "subprocess", "threading", "multiprocessing", "queue", "socket",
-            "ssl", "gzip", "bz2", "lzma", "pickle", "copy", "warnings",
-            
-            # Common data science libraries
-            "numpy", "pandas", "matplotlib", "seaborn", "scipy", "sklearn",
-            
-            # Common web libraries
-            "requests", "urllib3", "httpx",
-            
-            # Common video/image libraries
-            "moviepy", "PIL", "opencv", "cv2",
-            
-            # Common file formats
-            "yaml", "toml", "configparser", "argparse", "click",
-            
-            # Common HTML/formatting libraries
-            "json2html", "jinja2", "markdown", "beautifulsoup4", "bs4",
-        }
-        
-        self.blocked_patterns = [
-            r"__import__\s*\(",
-            r"exec\s*\(",
-            r"eval\s*\(",
-            r"compile\s*\(",
-            r"open\s*\(\s*['\"][^'\"]*\.\./",
-            r"open\s*\(\s*['\"][^'\"]*\.\.\\",
-            r"subprocess\.run\s*\(",
-            r"os\.system\s*\(",
-            r"os\.popen\s*\(",
-            r"os\.exec\w*\s*\(",
-            r"os\.spawn\w*\s*\(",
-            r"os\.fork\s*\(",
-            r"os\.kill\s*\(",
-            r"os\.remove\s*\(",
-            r"os\.unlink\s*\(",
-            r"os\.rmdir\s*\(",
-            r"os\.removedirs\s*\(",
-            r"shutil\.rmtree\s*\(",
-            r"shutil\.move\s*\(",
-            r"shutil\.copy\s*\(",
-            r"shutil\.copytree\s*\(",
-        ]
+        self.allowed_imports = _ALLOWED_IMPORTS
     
-    def validate_script(self, script: str, manifest: Dict[str, Any]) -> List[str]:
-        """Validate a script for security issues."""
+    def validate_script(self, script: Union[str, bytes], manifest: Dict[str, Any]) -> List[str]:
+        """Validate a script (source text or raw file bytes) for security issues."""
         errors = []
         
-        # Check for blocked patterns
-        for pattern in self.blocked_patterns:
-            if re.search(pattern, script, re.IGNORECASE):
-                errors.append(f"Blocked pattern detected: {pattern}")
-        
-        # Check imports
         try:
             tree = ast.parse(script)
-            imports = self._extract_imports(tree)
-            
-            for import_name in imports:
-                if not self._is_import_allowed(import_name, manifest):
-                    errors.append(f"Import not allowed: {import_name}")
-                    
         except SyntaxError as e:
-            errors.append(f"Syntax error in script: {e}")
+            return [f"Syntax error in script: {e}"]
+        
+        imports, blocked_calls = self._scan_tree(tree)
+        deps = manifest.get("deps") or ()
+        dep_names = self._dependency_names(deps)
+        
+        # Check for blocked calls
+        for call in sorted(blocked_calls):
+            errors.append(f"Blocked call detected: {call}")
+        
+        # Check imports
+        for import_name in imports:
+            if not self._is_import_allowed(import_name, dep_names, deps):
+                errors.append(f"Import not allowed: {import_name}")
         
         return errors
     
-    def _extract_imports(self, tree: ast.AST) -> Set[str]:
-        """Extract all import statements from AST."""
+    def _scan_tree(self, tree: ast.AST) -> Tuple[Set[str], Set[str]]:
+        """Collect imported packages and blocked calls in a single AST walk."""
         imports = set()
+        # Local name -> "module" or "module.attr" it was imported as
+        bound_names = {}
+        calls = []
         
         for node in ast.walk(tree):
             if isinstance(node, ast.Import):
                 for alias in node.names:
-                    imports.add(alias.name.split('.')[0])
+                    root = alias.name.split('.')[0]
+                    imports.add(root)
+                    # "import a.b" binds a, "import a.b as c" binds c to a.b
+                    if alias.asname:
+                        bound_names[alias.asname] = alias.name
+                    else:
+                        bound_names[root] = root
             elif isinstance(node, ast.ImportFrom):
                 if node.module:
                     imports.add(node.module.split('.')[0])
+                    for alias in node.names:
+                        bound_names[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+            elif isinstance(node, ast.Call):
+                calls.append(node)
+        
+        # Calls are resolved after the walk so aliases imported later in the
+        # traversal order (e.g. inside functions) are still known
+        blocked = set()
+        for call in calls:
+            name = self._call_name(call.func, bound_names)
+            if name is None:
+                continue
+            parts = name.split(".")
+            if (
+                name in _BLOCKED_CALLS
+                or name.startswith(_BLOCKED_CALL_PREFIXES)
+                or (parts[0] in _BUILTINS_ROOTS and parts[-1] in _BLOCKED_BUILTINS)
+            ):
+                blocked.add(name)
+            elif name == "open" and call.args and self._is_parent_path(call.args[0]):
+                blocked.add("open(<parent path>)")
         
-        return imports
+        return imports, blocked
     
-    def _is_import_allowed(self, import_name: str, manifest: Dict[str, Any]) -> bool:
-        """Check if an import is allowed based on manifest."""
+    def _call_name(self, func: ast.expr, bound_names: Dict[str, str]) -> Optional[str]:
+        """Return the dotted name a call target resolves to, e.g. ``os.system``."""
+        parts = []
+        while isinstance(func, ast.Attribute):
+            parts.append(func.attr)
+            func = func.value
+        if not isinstance(func, ast.Name):
+            return None
+        parts.append(bound_names.get(func.id, func.id))
+        return ".".join(reversed(parts))
+    
+    def _is_parent_path(self, node: ast.expr) -> bool:
+        """Check whether a literal path argument climbs out of its directory."""
+        return (
+            isinstance(node, ast.Constant)
+            and isinstance(node.value, str)
+            and ("../" in node.value or "..\\" in node.value)
+        )
+    
+    def _dependency_names(self, deps: List[str]) -> Set[str]:
+        """Collect the import names declared requirements can provide.
+        
+        Besides the normalized project name this adds the usual import-name
+        variants: without a ``python-``/``py`` prefix or ``-python`` suffix
+        (python-dateutil, pyjwt, ffmpeg-python) and the first dash-separated
+        part (websocket-client, google-cloud-storage).
+        """
+        names = set()
+        for dep in deps:
+            match = _REQUIREMENT_NAME_RE.match(dep)
+            if not match:
+                continue
+            name = match.group(1).lower().replace("-", "_").replace(".", "_")
+            names.add(name)
+            names.add(name.split("_", 1)[0])
+            for prefix in ("python_", "py"):
+                if name.startswith(prefix) and len(name) > len(prefix):
+                    names.add(name[len(prefix):])
+            if name.endswith("_python") and len(name) > len("_python"):
+                names.add(name[:-len("_python")])
+        return names
+    
+    def _is_import_allowed(self, import_name: str, dep_names: Set[str], deps: List[str]) -> bool:
+        """Check if an import is allowed or provided by a declared dependency."""
         # Check if import is in allowed list
         if import_name in self.allowed_imports:
             return True
         
-        # Check if import is in dependencies
-        deps = manifest.get("deps", [])
-        for dep in deps:
-            if import_name in dep.lower():
-                return True
-        
-        return False
+        # Check if import is in dependencies: known import names first, then
+        # any requirement containing it (attrs -> attr, grpcio -> grpc)
+        if import_name.lower() in dep_names:
+            return True
+        return any(import_name in dep.lower() for dep in deps)
     
     def validate_file_access(self, file_path: str, work_dir: Path) -> bool:
         """Validate that file access is within allowed directory."""
@@ -125,14 +198,15 @@ class SecurityManager:
     
     def create_sandbox_environment(self, work_dir: Path, manifest: Dict[str, Any]) -> Dict[str, Any]:
         """Create a sandbox environment for script execution."""
+        allow = manifest.get("allow") or _EMPTY_ALLOW
         env = {
             "PYTHONPATH": str(work_dir),
             "CAPIBARA_WORK_DIR": str(work_dir),
-            "CAPIBARA_NETWORK_ALLOWED": str(manifest.get("allow", {}).get("network", False)),
+            "CAPIBARA_NETWORK_ALLOWED": str(allow.get("network", False)),
         }
         
         # Add allowed file system paths
-        fs_allowed = manifest.get("allow", {}).get("fs", [])
+        fs_allowed = allow.get("fs")
         if fs_allowed:
             env["CAPIBARA_FS_ALLOWED"] = ":".join(fs_allowed)
         
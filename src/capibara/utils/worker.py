@@ -0,0 +1,150 @@
+"""Long-lived worker process for running cached scripts.
+
+The worker reads one JSON request per line from stdin, runs the requested
+script as ``__main__`` with the usual ``sys.argv`` contract, and writes one
+JSON response line back. A request with ``raw_args: n`` is followed by n
+lines that are used verbatim as the script's arguments. This keeps the
+interpreter warm across runs.
+
+Each script runs in a child forked from the worker, so module state,
+``sys.modules`` and builtins changed by one script never reach the next
+one or the worker's own protocol handling. Where ``fork`` is unavailable
+the worker serves a single request and exits.
+
+This file is executed directly by ``ScriptRunner`` and must only depend on
+the standard library.
+"""
+
+import json
+import os
+import runpy
+import sys
+import tempfile
+
+FORK = hasattr(os, "fork")
+
+
+def _run_script(request, stdout_fd, stderr_fd):
+    """Run the requested script in this process and return its exit code.
+
+    Output is captured at the file descriptor level, and ``sys.stdout`` and
+    ``sys.stderr`` are regular text streams over fds 1 and 2. Scripts can use
+    ``.buffer``, ``reconfigure()`` or ``fileno()`` and child processes
+    inherit the capture, as in a fresh interpreter. Nothing is restored
+    afterwards: the process exits once the script is done.
+    """
+    script = request["script"]
+    returncode = 0
+
+    sys.argv = [script] + request.get("args", [])
+    sys.path.insert(0, os.path.dirname(script))
+    os.chdir(request.get("cwd") or os.path.dirname(script))
+    if request.get("env") is not None:
+        os.environ.clear()
+        os.environ.update(request["env"])
+
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    sys.stdout = os.fdopen(1, "w", encoding="utf-8", closefd=False)
+    sys.stderr = os.fdopen(2, "w", encoding="utf-8", closefd=False)
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            returncode = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            returncode = 1
+    except BaseException as e:  # noqa: BLE001 - report any script failure
+        print(f"{type(e).__name__}: {e}", file=sys.stderr)
+        returncode = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+    return returncode
+
+
+def _run_request(request, protocol_fds=()):
+    """Run a single script request and capture its output.
+
+    With ``fork`` the script runs in a child that closes ``protocol_fds``
+    first, so it can neither see nor write the worker's request stream.
+    """
+    stdout_file = tempfile.TemporaryFile()
+    stderr_file = tempfile.TemporaryFile()
+    with stdout_file, stderr_file:
+        if FORK:
+            pid = os.fork()
+            if pid == 0:
+                returncode = 1
+                try:
+                    for fd in protocol_fds:
+                        os.close(fd)
+                    returncode = _run_script(
+                        request, stdout_file.fileno(), stderr_file.fileno()
+                    )
+                except BaseException as e:  # noqa: BLE001 - setup failures
+                    os.write(stderr_file.fileno(), str(e).encode("utf-8"))
+                finally:
+                    os._exit(returncode & 0xFF)
+            _, status = os.waitpid(pid, 0)
+            returncode = os.waitstatus_to_exitcode(status)
+        else:
+            returncode = _run_script(
+                request, stdout_file.fileno(), stderr_file.fileno()
+            )
+
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        return {
+            "stdout": stdout_file.read().decode("utf-8", "replace"),
+            "stderr": stderr_file.read().decode("utf-8", "replace"),
+            "returncode": returncode,
+        }
+
+
+def main():
+    """Serve script requests until stdin is closed."""
+    # Running this file directly puts capibara/utils on sys.path, which
+    # would let its modules shadow top-level imports in user scripts.
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+    if sys.path and os.path.abspath(sys.path[0]) == utils_dir:
+        sys.path.pop(0)
+
+    # Keep private handles for the protocol and point fd 1 at stderr and
+    # fd 0 at devnull so scripts cannot corrupt or consume it.
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = os.fdopen(
+        os.dup(sys.stdin.fileno()), "r", encoding="utf-8", newline="\n"
+    )
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, sys.stdin.fileno())
+    os.close(devnull)
+
+    for line in requests:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if request.get("raw_args"):
+                request["args"] = [
+                    requests.readline()[:-1] for _ in range(request["raw_args"])
+                ]
+            response = _run_request(
+                request, (channel.fileno(), requests.fileno())
+            )
+        except Exception as e:
+            response = {"stdout": "", "stderr": str(e), "returncode": 1}
+        channel.write(json.dumps(response) + "\n")
+        channel.flush()
+        if not FORK:
+            # The script ran in this process, so it cannot serve another one
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Tests for GroqLLMService response handling."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from capibara.core.llm_service import (
+    DEFAULT_MAX_TOKENS,
+    JSON_MAX_TOKENS,
+    GroqLLMService,
+)
+
+HEADER_ONLY_SCRIPT = """# --- CAPIBARA ---
+# language: python
+# entry: script.py
+# deps: 
+# network: false
+# template_version: 1.0.0
+# --- /CAPIBARA ---
+
+import json
+
+
+def main():
+    print(json.dumps({"status": "ok"}))
+
+
+if __name__ == "__main__":
+    main()
+"""
+
+
+@pytest.fixture
+def service():
+    return GroqLLMService(api_key="test", structured_output=False)
+
+
+def stream_until_complete(service, text):
+    """Feed ``text`` to ``_is_complete`` one character at a time."""
+    for end in range(1, len(text) + 1):
+        if service._is_complete(text[:end], 1):
+            return text[:end]
+    return text
+
+
+def test_header_only_script_is_complete_after_guard_body(service):
+    assert service._is_complete(HEADER_ONLY_SCRIPT + "H", 1)
+
+
+def test_header_only_script_waits_for_end_of_guard_body(service):
+    assert not service._is_complete(HEADER_ONLY_SCRIPT, 1)
+    assert not service._is_complete(HEADER_ONLY_SCRIPT[:-1], 1)
+
+
+def test_multi_line_guard_body_is_kept(service):
+    script = HEADER_ONLY_SCRIPT + "    sys.exit(0)\n"
+
+    streamed = stream_until_complete(service, script + "\nHope this helps!")
+
+    assert streamed.startswith(script)
+    assert service._extract_script(streamed).endswith("main()\n    sys.exit(0)")
+
+
+def test_main_guard_without_header_is_not_complete(service):
+    content = HEADER_ONLY_SCRIPT.split("# --- /CAPIBARA ---\n", 1)[1]
+    assert not service._is_complete(content + "H", 1)
+
+
+def test_fenced_script_is_complete(service):
+    content = "```python\nprint(1)\n```"
+    assert service._is_complete(content, 3)
+
+
+def fake_client(service, content, finish_reason="stop"):
+    """Make ``service`` answer every completion with ``content``."""
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content=content)
+        choice = SimpleNamespace(message=message, finish_reason=finish_reason)
+        return SimpleNamespace(choices=[choice], usage=None)
+
+    completions = SimpleNamespace(create=create)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return calls
+
+
+def test_json_mode_gets_a_larger_token_cap():
+    assert GroqLLMService(api_key="test").max_tokens == JSON_MAX_TOKENS
+    free_form = GroqLLMService(api_key="test", structured_output=False)
+    assert free_form.max_tokens == DEFAULT_MAX_TOKENS
+
+
+def test_truncated_response_is_rejected():
+    service = GroqLLMService(api_key="test")
+    fake_client(service, '{"script": "# --- CAPIBARA ---\\nimport json', "length")
+
+    with pytest.raises(Exception, match="truncated"):
+        service.generate_script("prompt")
+
+
+@pytest.mark.parametrize("line", ["# END OF LOOP", "# ENDPOINT", "# END"])
+def test_stop_sequences_ignore_ordinary_comments(service, line):
+    assert not any(stop in line for stop in service.stop)
+
+
+
+class FakeStream:
+    """Iterable stand-in for a streamed completion."""
+
+    def __init__(self, pieces):
+        self.chunks = [
+            SimpleNamespace(
+                choices=[
+                    SimpleNamespace(
+                        delta=SimpleNamespace(content=text), finish_reason=reason
+                    )
+                ]
+            )
+            for text, reason in pieces
+        ]
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+def test_truncated_stream_is_rejected(service):
+    stream = FakeStream([("```python\nimport json\n", None), ("x = 1", "length")])
+    completions = SimpleNamespace(create=lambda **kwargs: stream)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    with pytest.raises(Exception, match="truncated"):
+        service.generate_script("prompt")
+
+
+def test_unparseable_json_response_is_rejected():
+    service = GroqLLMService(api_key="test")
+    content = '{"script": "# --- CAPIBARA ---\\n# --- /CAPIBARA ---\\nimport json'
+    fake_client(service, content)
+
+    with pytest.raises(Exception, match="No valid script object"):
+        service.generate_script("prompt")
+
+
+def test_free_form_response_is_extracted(service):
+    stream = FakeStream([("```python\nprint(1)\n```", "stop")])
+    completions = SimpleNamespace(create=lambda **kwargs: stream)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    result = service.generate_script("prompt")
+
+    assert result["script"].endswith("print(1)")
+
+
+def test_token_limiter_reserves_before_each_call(monkeypatch):
+    monkeypatch.setenv("GROQ_TPM", "1000000")
+    service = GroqLLMService(api_key="test")
+    limiter = service._token_limiter
+    levels = []
+
+    async def create(**kwargs):
+        levels.append(limiter._level)
+        await asyncio.sleep(0)
+        message = SimpleNamespace(content='{"script": "print(1)"}')
+        choice = SimpleNamespace(message=message, finish_reason="stop")
+        usage = SimpleNamespace(total_tokens=100)
+        return SimpleNamespace(choices=[choice], usage=usage)
+
+    completions = SimpleNamespace(create=create)
+    service.aclient = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    async def generate_batch():
+        await asyncio.gather(*(service.agenerate_script("prompt") for _ in range(3)))
+
+    asyncio.run(generate_batch())
+
+    assert levels[0] > service.max_tokens
+    assert levels[2] > 3 * service.max_tokens
+    assert limiter._level < 300
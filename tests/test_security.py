@@ -0,0 +1,137 @@
+"""Tests for SecurityManager script validation."""
+
+import pytest
+
+from capibara.utils.security import SecurityManager
+
+
+@pytest.fixture
+def manager():
+    return SecurityManager()
+
+
+def blocked(manager, script, manifest=None):
+    """Return the blocked-call errors reported for a script."""
+    errors = manager.validate_script(script, manifest or {})
+    return [error for error in errors if error.startswith("Blocked call detected")]
+
+
+@pytest.mark.parametrize(
+    "script",
+    [
+        "exec('x')",
+        "eval('1')",
+        "compile('1', '<s>', 'eval')",
+        "__import__('os')",
+        "__builtins__.exec('x')",
+        "__builtins__.eval('1')",
+        "__builtins__.compile('1', '<s>', 'eval')",
+        "__builtins__.__import__('os')",
+        "import builtins\nbuiltins.exec('x')",
+        "import builtins as b\nb.eval('1')",
+        "from builtins import exec as run\nrun('x')",
+    ],
+)
+def test_blocks_dynamic_code_builtins(manager, script):
+    assert blocked(manager, script)
+
+
+@pytest.mark.parametrize(
+    ("script", "name"),
+    [
+        ("import os\nos.system('ls')", "os.system"),
+        ("import os\nos.execv('/bin/ls', [])", "os.execv"),
+        ("import os\nos.spawnl(0, 'ls')", "os.spawnl"),
+        ("import subprocess as sp\nsp.run(['ls'])", "subprocess.run"),
+        ("from os import system as s\ns('ls')", "os.system"),
+        ("from shutil import rmtree\nrmtree('x')", "shutil.rmtree"),
+        ("import os.path as p\nimport os as o\no.remove('x')", "os.remove"),
+        ("def f():\n    import os as o\n    o.unlink('x')", "os.unlink"),
+    ],
+)
+def test_blocks_aliased_calls(manager, script, name):
+    assert blocked(manager, script) == [f"Blocked call detected: {name}"]
+
+
+def test_blocks_open_on_parent_path(manager):
+    assert blocked(manager, "open('../secret.txt')")
+    assert blocked(manager, "open('..\\\\secret.txt')")
+    assert not blocked(manager, "open('data.txt')")
+
+
+@pytest.mark.parametrize(
+    "script",
+    [
+        "import re\nre.compile('a')",
+        "# os.system('ls')",
+        "text = \"eval('1')\"",
+        "import os\nos.path.join('a', 'b')",
+    ],
+)
+def test_allows_lookalikes(manager, script):
+    assert manager.validate_script(script, {}) == []
+
+
+def test_accepts_bytes(manager):
+    assert blocked(manager, b"import os\nos.system('ls')") == [
+        "Blocked call detected: os.system"
+    ]
+
+
+def test_syntax_error_is_reported(manager):
+    errors = manager.validate_script("def broken(:", {})
+    assert len(errors) == 1
+    assert errors[0].startswith("Syntax error in script")
+
+
+def test_rejects_undeclared_import(manager):
+    assert manager.validate_script("import leftpad", {}) == [
+        "Import not allowed: leftpad"
+    ]
+
+
+def test_allows_declared_dependency(manager):
+    manifest = {"deps": ["leftpad==1.0"]}
+    assert manager.validate_script("import leftpad", manifest) == []
+
+
+@pytest.mark.parametrize(
+    ("dep", "module"),
+    [
+        ("python-dateutil==2.8.2", "dateutil"),
+        ("python-dotenv==1.0", "dotenv"),
+        ("python-docx==1.1.0", "docx"),
+        ("pyjwt==2.8.0", "jwt"),
+        ("PyJWT>=2.0", "jwt"),
+        ("ffmpeg-python==0.2.0", "ffmpeg"),
+        ("websocket-client==1.7.0", "websocket"),
+        ("google-cloud-storage==2.14.0", "google"),
+        ("tqdm[notebook]>=4.0", "tqdm"),
+        ("Foo_Bar==1", "foo_bar"),
+    ],
+)
+def test_allows_import_names_of_declared_dependencies(manager, dep, module):
+    manifest = {"deps": [dep]}
+    assert manager.validate_script(f"import {module}", manifest) == []
+
+
+@pytest.mark.parametrize(
+    ("dep", "module"),
+    [
+        ("attrs==23.1.0", "attr"),
+        ("grpcio==1.60.0", "grpc"),
+        ("dnspython==2.4.2", "dns"),
+        ("GitPython==3.1.40", "git"),
+        ("python-telegram-bot==20.7", "telegram"),
+    ],
+)
+def test_dependency_names_fall_back_to_substrings(manager, dep, module):
+    manifest = {"deps": [dep]}
+    assert manager.validate_script(f"import {module}", manifest) == []
+
+
+def test_imports_outside_declared_dependencies_are_rejected(manager):
+    manifest = {"deps": ["tqdm-extra==1.0"]}
+    assert manager.validate_script("import leftpad", manifest) == [
+        "Import not allowed: leftpad"
+    ]
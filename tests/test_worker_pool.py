@@ -0,0 +1,127 @@
+"""Tests for the warm script WorkerPool."""
+
+import json
+import os
+import subprocess
+import sys
+import venv
+
+import pytest
+
+from capibara.utils.runner import WorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(max_idle=1)
+    yield pool
+    pool.close()
+
+
+def write(tmp_path, name, source):
+    path = tmp_path / name
+    path.write_text(source)
+    return path
+
+
+def run(pool, script, args=(), timeout=30, python=sys.executable):
+    return pool.run(script, list(args), dict(os.environ), timeout, python)
+
+
+def test_module_state_does_not_leak_between_scripts(pool, tmp_path):
+    spoof = write(
+        tmp_path,
+        "spoof.py",
+        "import json\n"
+        "json.loads = lambda s: 'SPOOFED'\n"
+        "json.dumps = lambda o: 'SPOOFED'\n"
+        "import builtins\n"
+        "builtins.LEAKED = True\n",
+    )
+    check = write(
+        tmp_path,
+        "check.py",
+        "import builtins, json, sys\n"
+        "print(json.dumps({'n': json.loads(sys.argv[1])['n'],"
+        " 'leaked': hasattr(builtins, 'LEAKED')}))\n",
+    )
+
+    run(pool, spoof)
+    stdout, _ = run(pool, check, ['{"n": 3}'])
+
+    assert json.loads(stdout) == {"n": 3, "leaked": False}
+
+
+def test_worker_is_reused(pool, tmp_path):
+    script = write(tmp_path, "pid.py", "import os\nprint(os.getppid())\n")
+
+    first, _ = run(pool, script)
+    second, _ = run(pool, script)
+
+    assert first == second
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ['{"a": "b"}', "plain", ""],
+        ["line one\nline two", "tab\there"],
+        [],
+    ],
+)
+def test_arguments_reach_the_script(pool, tmp_path, args):
+    script = write(
+        tmp_path, "argv.py", "import json, sys\nprint(json.dumps(sys.argv[1:]))\n"
+    )
+
+    stdout, _ = run(pool, script, args)
+
+    assert json.loads(stdout) == args
+
+
+def test_output_and_exit_status(pool, tmp_path):
+    script = write(
+        tmp_path,
+        "fail.py",
+        "import sys\n"
+        "sys.stdout.buffer.write(b'bytes\\n')\n"
+        "print('err', file=sys.stderr)\n"
+        "raise ValueError('boom')\n",
+    )
+
+    stdout, stderr = run(pool, script)
+
+    assert stdout == "bytes\n"
+    assert "err" in stderr and "ValueError: boom" in stderr
+
+
+def test_timeout_discards_the_worker(pool, tmp_path):
+    slow = write(tmp_path, "slow.py", "import time\ntime.sleep(30)\n")
+    fast = write(tmp_path, "fast.py", "print('ok')\n")
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        run(pool, slow, timeout=1)
+    stdout, _ = run(pool, fast)
+
+    assert stdout == "ok\n"
+
+
+def test_venv_workers_are_isolated(pool, tmp_path):
+    env_dir = tmp_path / "venv"
+    venv.create(env_dir, with_pip=False)
+    interpreter = "Scripts/python.exe" if sys.platform == "win32" else "bin/python"
+    python = str(env_dir / interpreter)
+    spoof = write(
+        tmp_path, "spoof.py", "import json\njson.loads = lambda s: 'SPOOFED'\n"
+    )
+    check = write(
+        tmp_path,
+        "check.py",
+        "import json, sys\n"
+        "print(json.dumps([sys.prefix, json.loads(sys.argv[1])]))\n",
+    )
+
+    run(pool, spoof, python=python)
+    stdout, _ = run(pool, check, ['{"n": 3}'], python=python)
+
+    assert json.loads(stdout) == [str(env_dir), {"n": 3}]